@@ -17,9 +17,107 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import cv2
 import numpy as np
-from PIL import Image, ImageTk
+from PIL import Image, ImageDraw, ImageFont, ImageTk
+import io
 import json
 import csv
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; LED sampling and interpolation fall back to NumPy/OpenCV
+    njit = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; _dumps falls back to json
+    orjson = None
+
+def _json_default(obj):
+    """Make NumPy arrays and scalars JSON-serializable for the json fallback"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(obj, indent=False):
+    """Serialize obj to JSON bytes, preferring orjson; NumPy values are accepted by both paths"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0))
+    return json.dumps(obj, indent=2 if indent else None, default=_json_default).encode()
+
+def led_columns(positions=()):
+    """Build the column-wise LED table from (x, y, row, col) tuples"""
+    table = np.array(list(positions), dtype=np.int64).reshape(-1, 4)
+    return {
+        'x': table[:, 0].astype(np.int32),
+        'y': table[:, 1].astype(np.int32),
+        'row': table[:, 2].astype(np.int16),
+        'col': table[:, 3].astype(np.int16)
+    }
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _measure_windows(image, gray, xs, ys, r):
+        """Per-LED window means: brightness, R, G, B and the window pixel count"""
+        h, w = gray.shape
+        out = np.zeros((xs.size, 5))
+        for i in prange(xs.size):
+            # Window bounds, clipped like image[y1:y2, x1:x2]
+            x1 = min(max(0, xs[i] - r), w)
+            y1 = min(max(0, ys[i] - r), h)
+            x2 = min(w, xs[i] + r + 1)
+            y2 = min(h, ys[i] + r + 1)
+            if x2 <= x1 or y2 <= y1:
+                continue
+                
+            lum = 0
+            red = 0
+            green = 0
+            blue = 0
+            for y in range(y1, y2):
+                for x in range(x1, x2):
+                    lum += gray[y, x]
+                    red += image[y, x, 0]
+                    green += image[y, x, 1]
+                    blue += image[y, x, 2]
+                    
+            count = (x2 - x1) * (y2 - y1)
+            out[i, 0] = lum / count
+            out[i, 1] = red / count
+            out[i, 2] = green / count
+            out[i, 3] = blue / count
+            out[i, 4] = count
+        return out
+        
+    @njit(cache=True)
+    def _neighbour_sums(values, usable):
+        """Sum usable (brightness, r, g, b) values and count usable cells over each cell's 8 neighbours"""
+        n = usable.shape[0]
+        sums = np.zeros(values.shape)
+        counts = np.zeros((n, n))
+        for row in range(n):
+            for col in range(n):
+                for r in range(max(row - 1, 0), min(row + 2, n)):
+                    for c in range(max(col - 1, 0), min(col + 2, n)):
+                        if (r == row and c == col) or not usable[r, c]:
+                            continue
+                        for k in range(values.shape[0]):
+                            sums[k, row, col] += values[k, r, c]
+                        counts[row, col] += 1
+        return sums, counts
+else:
+    _measure_windows = None
+    _neighbour_sums = None
+
+@dataclass(frozen=True)
+class Change:
+    """A single undoable edit, replayed by PixelQApp.apply_change"""
+    kind: str  # 'define_corners', 'corner_move' or 'clear'
+    payload: Any  # Tuples and read-only LED columns, shared rather than copied
 
 class PixelQApp:
     def __init__(self, root):
@@ -30,40 +128,108 @@ class PixelQApp:
         
         # Initialize variables
         self.original_image = None
+        self._image_cache = OrderedDict()  # Decoded images keyed by (path, mtime) (LRU)
+        self.image_cache_size = 4
         self.display_image = None
         self.photo = None
         self.canvas_width = 800
         self.canvas_height = 600
         self.scale_factor = 1.0
         
+        # Rendered PhotoImages keyed by view parameters (LRU), bounded by entry
+        # count and total pixels; Tk keeps 4 bytes per pixel, so high zoom
+        # frames are large and frames over the pixel budget are not cached
+        self._photo_cache = OrderedDict()
+        self.photo_cache_size = 4
+        self.photo_cache_pixels = 24_000_000  # About 96 MB of Tk photo memory
+        self._scratch = {}  # Persistent work arrays by name, see scratch_buffer()
+        self._gamma_luts = {}  # 256-entry uint8 gamma tables keyed by gamma
+        
         # LED array parameters
         self.array_size = tk.IntVar(value=8)  # nxn grid
         self.grid_visible = tk.BooleanVar(value=True)
         self.grid_corners = []  # Four corners of the LED array
-        self.led_positions = []  # Calculated LED positions
+        self.led_positions_arr = led_columns()  # Calculated LED positions (x, y, row, col columns)
+        self._led_grid_items = []  # Canvas oval ids of the LED grid overlay
+        self._led_label_items = []  # (canvas text id, label) pairs of the LED grid overlay
+        self._led_xy = None  # (N, 2) float32 LED coordinates for hit-testing, rebuilt lazily
+        self._led_bbox = None  # (N, 4) int32 adjustment-marker boxes (x0, y0, x1, y1), rebuilt lazily
+        self._corner_xy = None  # (corners tuple, (4, 2) float32 array) for hit-testing
+        self._highlight_overlay = None  # (PhotoImage, x, y) of the adjustment-mode markers
         
         # Drawing state
         self.drawing_grid = False
         self.grid_corner_count = 0
         self.manual_positioning = False
         self.manual_positions = {}  # Store manually positioned LEDs
+        self._pending_manual = []  # (x, y, row, col) clicks not yet drawn on the canvas
+        self._manual_flush_id = None  # after id of the scheduled marker flush
+        self.manual_flush_ms = 30  # Clicks within this window are drawn together
         self.adjusting_pixels = False
         self.selected_led_index = None  # Track which LED is being adjusted
         self.detection_method = tk.StringVar(value="grid")  # Keep for compatibility
         
         # Undo/Redo system
-        self.history = []  # Store states for undo
-        self.redo_stack = []  # Store states for redo
         self.max_history = 20  # Maximum undo steps
+        self.history = deque(maxlen=self.max_history)  # Store changes for undo, oldest dropped first
+        self.redo_stack = deque(maxlen=self.max_history)  # Store changes for redo
+        self._corners_before_definition = None  # (corners tuple, read-only LED columns, array size) saved while defining a grid
+        
+        # Results table rows, inserted into the treeview a page at a time
+        self._result_rows = []
+        self._result_rows_shown = 0
+        self.results_page_size = 500
+        self._results_load_pending = False  # A page load is already scheduled
         
         # Zoom functionality
         self.zoom_level = 1.0
         self.min_zoom = 0.1
         self.max_zoom = 5.0
         self.zoom_step = 0.1
+        self._zoom_pending = None  # after id of a scheduled zoom redraw
+        self.zoom_delay_ms = 15  # Wheel events within this window render once
+        self._last_zoom = None  # (image id, zoom level) currently shown by apply_zoom
+        
+        # Zoom resizes run on a worker thread (cv2 releases the GIL); finished
+        # frames come back through a queue that the Tk thread polls
+        self._resize_pool = ThreadPoolExecutor(max_workers=1)
+        self._zoom_results = queue.Queue()
+        self._zoom_gen = 0  # Bumped per request so stale frames are dropped
+        self._zoom_jobs = 0  # Resizes submitted but not yet collected
+        self._zoom_future = None  # Latest submitted resize, cancelled when superseded
+        self.zoom_poll_ms = 10
         
         self.setup_ui()
         
+    def _set_leds(self, columns):
+        """Replace the LED position columns, dropping everything derived from them"""
+        self.led_positions_arr = columns
+        self._invalidate_led_cache()
+        
+    def _move_led(self, index, x, y):
+        """Move one LED, keeping the cached hit-test coordinates in step"""
+        if not self.led_positions_arr['x'].flags.writeable:
+            # Columns shared with the undo history are copied on first write
+            self.led_positions_arr = self.copy_led_columns()
+        self.led_positions_arr['x'][index] = x
+        self.led_positions_arr['y'][index] = y
+        if self._led_xy is not None:
+            self._led_xy[index] = (x, y)
+        if self._led_bbox is not None:
+            self._led_bbox[index] = (x - 4, y - 4, x + 4, y + 4)
+        self._highlight_overlay = None
+        
+    def _invalidate_led_cache(self):
+        """Drop arrays derived from the LED positions after they change"""
+        self._led_xy = None
+        self._led_bbox = None
+        self._highlight_overlay = None
+        
+    @property
+    def led_count(self):
+        """Number of LED positions currently defined"""
+        return len(self.led_positions_arr['x'])
+        
     def setup_ui(self):
         """Setup the user interface"""
         # Create main container with simpler structure
@@ -108,7 +274,8 @@ class PixelQApp:
             self.control_canvas.unbind_all("<Button-4>")
             self.control_canvas.unbind_all("<Button-5>")
         
-        # Bind enter/leave events for better mousewheel handling
+        # Bind enter/leave events for better mousewheel handling; the wheel goes to
+        # the widget under the pointer, so only bind_all reaches the panel's children
         self.control_canvas.bind("<Enter>", _on_enter)
         self.control_canvas.bind("<Leave>", _on_leave)
         
@@ -291,11 +458,11 @@ class PixelQApp:
         self.results_tree.column('B', width=40)
         
         # Scrollbar for results
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
-        self.results_tree.configure(yscrollcommand=scrollbar.set)
+        self.results_scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=self.on_results_scroll)
         
         self.results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=2, pady=2)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=2)
+        self.results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=2)
         
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
@@ -316,11 +483,23 @@ class PixelQApp:
         
         if file_path:
             try:
-                self.original_image = cv2.imread(file_path)
-                if self.original_image is None:
-                    raise ValueError("Could not load image")
-                
-                self.original_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB)
+                key = (file_path, os.path.getmtime(file_path))
+                image = self._image_cache.get(key)
+                if image is None:
+                    image = cv2.imread(file_path)
+                    if image is None:
+                        raise ValueError("Could not load image")
+                    
+                    # Store as contiguous RGB uint8 so resizing and slicing never copy again
+                    image = np.ascontiguousarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), dtype=np.uint8)
+                    self._image_cache[key] = image
+                    if len(self._image_cache) > self.image_cache_size:
+                        self._image_cache.popitem(last=False)  # Evict least recently used
+                    self._photo_cache.clear()
+                else:
+                    self._image_cache.move_to_end(key)
+                    
+                self.original_image = image
                 self.display_image_on_canvas()
                 self.status_var.set(f"Image loaded: {os.path.basename(file_path)}")
                 
@@ -342,25 +521,92 @@ class PixelQApp:
         scale_w = self.canvas_width / w
         scale_h = self.canvas_height / h
         self.scale_factor = min(scale_w, scale_h, 1.0)  # Don't upscale
+        if self.scale_factor >= 0.999:
+            self.scale_factor = 1.0  # Close enough to show the image unscaled
         
-        # Resize image for display
-        new_w = int(w * self.scale_factor)
-        new_h = int(h * self.scale_factor)
-        self.display_image = cv2.resize(self.original_image, (new_w, new_h))
+        def render():
+            if self.scale_factor == 1.0:
+                # Identity scale - display the original pixels directly
+                self.display_image = self.original_image
+            else:
+                # Resize image for display into a persistent buffer
+                new_w = int(w * self.scale_factor)
+                new_h = int(h * self.scale_factor)
+                buf = self.scratch_buffer('fit_view', (new_h, new_w) + self.original_image.shape[2:],
+                                          self.original_image.dtype)
+                self.display_image = cv2.resize(self.original_image, (new_w, new_h), dst=buf,
+                                                interpolation=cv2.INTER_AREA)
+            
+            # Convert to PhotoImage
+            return self.array_to_photo(self.display_image)
         
-        # Convert to PIL Image and then to PhotoImage
-        pil_image = Image.fromarray(self.display_image)
-        self.photo = ImageTk.PhotoImage(pil_image)
+        self._last_zoom = None  # The fit view replaces any zoomed bitmap
+        self._zoom_gen += 1  # and any zoom still being resized
+        if self._zoom_future is not None:
+            self._zoom_future.cancel()
+        key = ('fit', id(self.original_image), self.scale_factor, round(self.zoom_level, 4),
+               self.canvas_width, self.canvas_height)
+        self.photo = self.get_cached_photo(key, render)
         
-        # Clear canvas and display image
-        self.canvas.delete("all")
-        self.canvas.create_image(self.canvas_width//2, self.canvas_height//2, 
-                               image=self.photo, anchor=tk.CENTER)
+        # Display image
+        self.show_bitmap()
         
         # Redraw overlays
+        self.refresh_overlays()
+        
+    def show_bitmap(self):
+        """Show self.photo on the canvas bitmap layer, leaving overlay items in place"""
+        if self.canvas.find_withtag('bitmap'):
+            self.canvas.itemconfig('bitmap', image=self.photo)
+        else:
+            self.canvas.create_image(self.canvas_width//2, self.canvas_height//2, 
+                                   image=self.photo, anchor=tk.CENTER, tags='bitmap')
+        self.canvas.tag_lower('bitmap')  # Keep overlays on top
+        
+    def array_to_photo(self, array):
+        """Convert an RGB (or grayscale) uint8 array to a PhotoImage"""
+        # Hand Tk the raw pixels behind a binary PPM/PGM header, skipping the PIL
+        # image in between; Tk copies them, so the array may be reused afterwards
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+        h, w = array.shape[:2]
+        magic = b'P6' if array.ndim == 3 else b'P5'
+        data = b'%s\n%d %d\n255\n' % (magic, w, h) + array.tobytes()
+        return tk.PhotoImage(width=w, height=h, data=data, format='PPM')
+        
+    def scratch_buffer(self, name, shape, dtype):
+        """Return a persistent work array, reallocated only when its shape or dtype changes"""
+        buf = self._scratch.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._scratch[name] = buf
+        return buf
+        
+    def get_cached_photo(self, key, render):
+        """Return the PhotoImage for key, calling render() only on a cache miss"""
+        photo = self._photo_cache.get(key)
+        if photo is not None:
+            self._photo_cache.move_to_end(key)
+            return photo
+            
+        photo = render()
+        pixels = photo.width() * photo.height()
+        if pixels > self.photo_cache_pixels:
+            return photo  # Too large to keep; only self.photo holds it
+            
+        self._photo_cache[key] = photo
+        total = sum(p.width() * p.height() for p in self._photo_cache.values())
+        while len(self._photo_cache) > self.photo_cache_size or total > self.photo_cache_pixels:
+            _, evicted = self._photo_cache.popitem(last=False)  # Evict least recently used
+            total -= evicted.width() * evicted.height()
+        return photo
+        
+    def refresh_overlays(self):
+        """Redraw corner and LED grid overlays without touching the image bitmap"""
         self.draw_grid_corners()
         if self.grid_visible.get():
             self.draw_led_grid()
+        else:
+            self.clear_led_grid()
             
     def canvas_click(self, event):
         """Handle canvas click events"""
@@ -373,18 +619,21 @@ class PixelQApp:
                 self.drawing_grid = False
                 self.status_var.set("Grid corners defined. Calculate LED positions.")
                 self.calculate_led_positions()
-                self.save_state()  # Save state after defining corners
+                old_corners, old_leds, old_n = self._corners_before_definition
+                self.save_state('define_corners', (old_corners, tuple(self.grid_corners), old_leds,
+                                                   self.freeze_led_columns(), old_n, self.array_size.get()))
                 
         elif hasattr(self, 'editing_corners') and self.editing_corners:
             # Check if clicking near an existing corner to edit it
             corner_index = self.find_nearest_corner(event.x, event.y)
             if corner_index is not None:
+                old_corner = self.grid_corners[corner_index]
+                old_leds = self.freeze_led_columns()
                 self.grid_corners[corner_index] = (event.x, event.y)
-                self.draw_grid_corners()
                 self.calculate_led_positions()
-                if self.grid_visible.get():
-                    self.draw_led_grid()
-                self.save_state()  # Save state after editing corner
+                self.refresh_overlays()
+                self.save_state('corner_move', (corner_index, old_corner, (event.x, event.y), old_leds,
+                                                self.freeze_led_columns(), self.array_size.get()))
                 self.status_var.set(f"Updated corner {corner_index + 1} - Grid recalculated")
                 
         elif self.adjusting_pixels:
@@ -405,7 +654,12 @@ class PixelQApp:
             
     def start_grid_definition(self):
         """Start defining grid corners"""
-        self.save_state()  # Save state before starting new definition
+        # Remember what the definition replaces. LED positions are kept as-is, since
+        # adjustments, manual positioning or auto-align may have moved them off the grid
+        if not self.drawing_grid:
+            self._corners_before_definition = (tuple(self.grid_corners), self.freeze_led_columns(),
+                                               self.array_size.get())
+        self.redo_stack.clear()
         self.drawing_grid = True
         self.grid_corner_count = 0
         self.grid_corners = []
@@ -440,44 +694,82 @@ class PixelQApp:
         
         # Calculate LED positions in grid
         n = self.array_size.get()
-        self.led_positions = []
         
-        for row in range(n):
-            for col in range(n):
-                # Bilinear interpolation between corners
-                u = col / (n - 1) if n > 1 else 0
-                v = row / (n - 1) if n > 1 else 0
-                
-                # Interpolate between corners
-                top = corners[0] * (1 - u) + corners[1] * u
-                bottom = corners[3] * (1 - u) + corners[2] * u
-                pos = top * (1 - v) + bottom * v
-                
-                self.led_positions.append((int(pos[0]), int(pos[1]), row, col))
+        # Bilinear interpolation weights along columns (u) and rows (v)
+        u = np.linspace(0, 1, n, dtype=np.float32)[None, :, None]
+        v = np.linspace(0, 1, n, dtype=np.float32)[:, None, None]
+        
+        # Interpolate between corners for the whole (n, n, 2) grid at once
+        top = corners[0] * (1 - u) + corners[1] * u
+        bottom = corners[3] * (1 - u) + corners[2] * u
+        pos = top * (1 - v) + bottom * v
+        
+        rows, cols = np.indices((n, n))
+        self._set_leds({
+            'x': pos[..., 0].astype(np.int32).ravel(),
+            'y': pos[..., 1].astype(np.int32).ravel(),
+            'row': rows.astype(np.int16).ravel(),
+            'col': cols.astype(np.int16).ravel()
+        })
                 
     def draw_led_grid(self):
-        """Draw LED grid overlay"""
-        if not self.led_positions:
-            return
+        """Draw LED grid overlay, moving existing canvas items instead of recreating them"""
+        count = self.led_count
+        show_labels = self.array_size.get() <= 50  # Labels are unreadable on dense grids
+        
+        if not self._led_grid_items:
+            # Nothing tracked yet - drop any other markers (e.g. adjustment highlights)
+            self.canvas.delete('led_grid')
             
-        for x, y, row, col in self.led_positions:
+        # Delete only the items of LEDs that no longer exist
+        label_count = count if show_labels else 0
+        for item in self._led_grid_items[count:]:
+            self.canvas.delete(item)
+        for item, _ in self._led_label_items[label_count:]:
+            self.canvas.delete(item)
+        del self._led_grid_items[count:]
+        del self._led_label_items[label_count:]
+        
+        arr = self.led_positions_arr
+        positions = zip(arr['x'].tolist(), arr['y'].tolist(), arr['row'].tolist(), arr['col'].tolist())
+        for i, (x, y, row, col) in enumerate(positions):
             # Draw LED position marker
-            self.canvas.create_oval(x-3, y-3, x+3, y+3, fill='green', outline='darkgreen', tags='led_grid')
+            if i < len(self._led_grid_items):
+                self.canvas.coords(self._led_grid_items[i], x-3, y-3, x+3, y+3)
+            else:
+                self._led_grid_items.append(self.canvas.create_oval(
+                    x-3, y-3, x+3, y+3, fill='green', outline='darkgreen', tags='led_grid'))
+                
+            if not show_labels:
+                continue
+                
             # Draw LED number
-            self.canvas.create_text(x+8, y-8, text=f'{row},{col}', fill='green', font=('Arial', 8), tags='led_grid')
-            
+            text = f'{row},{col}'
+            if i < len(self._led_label_items):
+                item, old_text = self._led_label_items[i]
+                self.canvas.coords(item, x+8, y-8)
+                if text != old_text:
+                    self.canvas.itemconfig(item, text=text)
+                    self._led_label_items[i] = (item, text)
+            else:
+                self._led_label_items.append((self.canvas.create_text(
+                    x+8, y-8, text=text, fill='green', font=('Arial', 8), tags='led_grid'), text))
+                    
+    def clear_led_grid(self):
+        """Remove the LED grid overlay from the canvas"""
+        self.canvas.delete('led_grid')
+        self._led_grid_items = []
+        self._led_label_items = []
+        
     def toggle_grid(self):
         """Toggle grid visibility"""
-        self.canvas.delete('led_grid')
-        if self.grid_visible.get():
-            self.draw_led_grid()
+        self.refresh_overlays()
             
     def update_grid(self):
         """Update grid when array size changes"""
         if self.grid_corners:
             self.calculate_led_positions()
             if self.grid_visible.get():
-                self.canvas.delete('led_grid')
                 self.draw_led_grid()
                 
     def auto_align(self):
@@ -487,28 +779,41 @@ class PixelQApp:
             return
             
         try:
+            # Detection only needs rough centers, so work on a small copy
+            h, w = self.original_image.shape[:2]
+            s = min(640 / w, 480 / h, 1.0)
+            if s < 1.0:
+                small = cv2.resize(self.original_image, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+            else:
+                small = self.original_image
+            
             # Convert to grayscale for processing
-            gray = cv2.cvtColor(self.original_image, cv2.COLOR_RGB2GRAY)
+            gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
             
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            # Threshold against the local mean to find bright spots (LEDs)
+            # in a single pass that also tolerates uneven illumination
+            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                           15, -5, dst=self.scratch_buffer('align_thresh', gray.shape, np.uint8))
             
-            # Threshold to find bright spots (LEDs)
-            _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # Label bright blobs; stats and centroids come back as arrays
+            _, _, stats, centroids = cv2.connectedComponentsWithStats(thresh, connectivity=8)
             
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Skip label 0 (background)
+            areas = stats[1:, cv2.CC_STAT_AREA]
+            bw = stats[1:, cv2.CC_STAT_WIDTH]
+            bh = stats[1:, cv2.CC_STAT_HEIGHT]
+            aspect_ratio = bw / np.maximum(bh, 1)
             
-            # Filter contours by area and aspect ratio
-            led_candidates = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 10:  # Minimum area threshold
-                    x, y, w, h = cv2.boundingRect(contour)
-                    aspect_ratio = w / h
-                    if 0.5 < aspect_ratio < 2.0:  # Roughly square
-                        center = (x + w//2, y + h//2)
-                        led_candidates.append(center)
+            # Filter by area (scaled to the working size) and roughly square shape. A
+            # component area counts pixels, unlike the near-zero area of tiny blobs under
+            # contourArea; a few working pixels are always required so threshold noise
+            # specks on large, heavily downscaled photos are not taken for LEDs
+            min_area = max(10 * s * s, 4)
+            mask = (areas > min_area) & (aspect_ratio > 0.5) & (aspect_ratio < 2.0)
+            
+            # Map centroids back to original image coordinates
+            centers = (centroids[1:][mask] / s).astype(int)
+            led_candidates = list(map(tuple, centers.tolist()))
             
             if len(led_candidates) >= 4:
                 # Try to arrange candidates in a grid
@@ -532,17 +837,17 @@ class PixelQApp:
                                  f"Found {len(candidates)} candidates, expected {expected_leds}")
         
         # For now, just use the first n*n candidates
-        self.led_positions = []
-        for i, (x, y) in enumerate(candidates[:expected_leds]):
-            row = i // n
-            col = i % n
+        xy = np.array(candidates[:expected_leds], dtype=np.float64).reshape(-1, 2)
+        index = np.arange(len(xy))
+        self._set_leds({
             # Scale coordinates to display coordinates
-            display_x = int(x * self.scale_factor)
-            display_y = int(y * self.scale_factor)
-            self.led_positions.append((display_x, display_y, row, col))
+            'x': (xy[:, 0] * self.scale_factor).astype(np.int32),
+            'y': (xy[:, 1] * self.scale_factor).astype(np.int32),
+            'row': (index // n).astype(np.int16),
+            'col': (index % n).astype(np.int16)
+        })
             
         if self.grid_visible.get():
-            self.canvas.delete('led_grid')
             self.draw_led_grid()
             
     def measure_brightness(self):
@@ -552,68 +857,65 @@ class PixelQApp:
             return
             
         # Determine which positions to use based on detection method
-        positions_to_use = []
-        
         if self.measurement_method.get() == "manual" and self.manual_positions:
             # Use manual positions
             n = self.array_size.get()
+            manual = []
             for row in range(n):
                 for col in range(n):
                     if (row, col) in self.manual_positions:
                         x, y = self.manual_positions[(row, col)]
-                        positions_to_use.append((x, y, row, col))
+                        manual.append((x, y, row, col))
+            positions_to_use = led_columns(manual)
                         
         else:
             # Use grid-based positions
-            if not self.led_positions:
+            if not self.led_count:
                 messagebox.showwarning("Warning", "Please define LED positions first (use grid corners or manual positioning)")
                 return
-            positions_to_use = self.led_positions
-            
-        # Clear previous results
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-            
-        # Prepare image for measurement
-        work_image = self.original_image.copy()
-        
-        # Apply enhancements if requested
-        if self.enhance_dark_leds.get():
-            work_image = self.enhance_dark_regions(work_image)
+            positions_to_use = self.led_positions_arr
             
         results = {}
         region_size = self.sampling_size.get()
         
-        for display_x, display_y, row, col in positions_to_use:
-            # Convert display coordinates back to original image coordinates
-            orig_x = int(display_x / self.scale_factor)
-            orig_y = int(display_y / self.scale_factor)
-            
-            # Define sampling region
-            x1 = max(0, orig_x - region_size)
-            y1 = max(0, orig_y - region_size)
-            x2 = min(work_image.shape[1], orig_x + region_size + 1)
-            y2 = min(work_image.shape[0], orig_y + region_size + 1)
-            
-            # Extract region
-            region = work_image[y1:y2, x1:x2]
+        # Convert display coordinates back to original image coordinates
+        orig_x = (positions_to_use['x'] / self.scale_factor).astype(np.int64)
+        orig_y = (positions_to_use['y'] / self.scale_factor).astype(np.int64)
+        
+        # Prepare image for measurement - the original is only read, so it is
+        # used directly unless an enhanced copy is requested
+        roi = self.led_region(orig_x, orig_y, region_size) if self.enhance_dark_leds.get() else None
+        if roi is not None:
+            # Only the LED bounding box is enhanced and sampled; it contains every
+            # sampling window, so positions are just shifted into its frame
+            x0, y0, x1, y1 = roi
+            work_image = self.enhance_dark_regions(self.original_image[y0:y1, x0:x1])
+            orig_x = orig_x - x0
+            orig_y = orig_y - y0
+        elif self.enhance_dark_leds.get():
+            work_image = self.enhance_dark_regions(self.original_image)
+        else:
+            work_image = self.original_image
             
-            if region.size > 0:
-                # Calculate average RGB values
-                avg_r = np.mean(region[:, :, 0])
-                avg_g = np.mean(region[:, :, 1])
-                avg_b = np.mean(region[:, :, 2])
-                
-                # Calculate brightness (luminance)
-                brightness = 0.299 * avg_r + 0.587 * avg_g + 0.114 * avg_b
-                
-                results[(row, col)] = {
-                    'brightness': brightness,
-                    'r': avg_r,
-                    'g': avg_g,
-                    'b': avg_b,
-                    'interpolated': False
-                }
+        # Luminance plane (BT.601 weights) for brightness sampling
+        gray = cv2.cvtColor(work_image, cv2.COLOR_RGB2GRAY,
+                            dst=self.scratch_buffer('measure_gray', work_image.shape[:2], np.uint8))
+        
+        # Sample every LED region in one pass: brightness from the luminance
+        # plane, per-channel averages from the color image
+        brightness, rgb, valid = self.measure_led_windows(work_image, gray, orig_x, orig_y, region_size)
+        
+        for i in np.flatnonzero(valid).tolist():
+            row = int(positions_to_use['row'][i])
+            col = int(positions_to_use['col'][i])
+            avg_r, avg_g, avg_b = rgb[i].tolist()
+            results[(row, col)] = {
+                'brightness': float(brightness[i]),
+                'r': avg_r,
+                'g': avg_g,
+                'b': avg_b,
+                'interpolated': False
+            }
         
         # Apply interpolation for missing measurements if selected
         if self.measurement_method.get() == "interpolation":
@@ -621,6 +923,7 @@ class PixelQApp:
             
         # Convert to list format and display results
         measurement_list = []
+        tree_rows = []
         
         # Show in grid order
         n = self.array_size.get()
@@ -647,7 +950,7 @@ class PixelQApp:
                     if data.get('interpolated', False):
                         brightness_text += "*"  # Mark interpolated values
                         
-                    self.results_tree.insert('', 'end', values=(
+                    tree_rows.append((
                         led_id, row, col, brightness_text, 
                         f"{data['r']:.1f}", f"{data['g']:.1f}", f"{data['b']:.1f}"
                     ))
@@ -655,6 +958,7 @@ class PixelQApp:
                     led_id += 1
         
         self.measurement_results = measurement_list;
+        self.show_results(tree_rows)
         
         # Update status with method used
         method_name = {
@@ -670,6 +974,78 @@ class PixelQApp:
             
         self.status_var.set(status_msg)
         
+    def show_results(self, rows):
+        """Replace the results table contents with the given row values"""
+        self.results_tree.delete(*self.results_tree.get_children())
+        self._result_rows = rows
+        self._result_rows_shown = 0
+        
+        # Large result sets are filled in further as the user scrolls down
+        self.load_more_results()
+        
+    def load_more_results(self):
+        """Insert the next page of result rows into the results table"""
+        self._results_load_pending = False
+        start = self._result_rows_shown
+        rows = self._result_rows[start:start + self.results_page_size]
+        if not rows:
+            return
+            
+        # Treeview defers its layout to idle time, so the page is laid out once
+        for values in rows:
+            self.results_tree.insert('', 'end', values=values)
+        self._result_rows_shown += len(rows)
+        
+    def on_results_scroll(self, first, last):
+        """Update the results scrollbar and load more rows near the bottom"""
+        self.results_scrollbar.set(first, last)
+        if (float(last) >= 0.9 and not self._results_load_pending
+                and self._result_rows_shown < len(self._result_rows)):
+            # One scroll gesture fires several callbacks; load a single page for them
+            self._results_load_pending = True
+            self.root.after_idle(self.load_more_results)
+            
+    def measure_led_windows(self, image, gray, xs, ys, region_size):
+        """Return per-LED brightness, (N, 3) RGB means and a mask of sampled LEDs"""
+        if _measure_windows is not None:
+            # Compiled kernel: parallel over LEDs, no per-image tables needed
+            out = _measure_windows(image, gray, xs, ys, region_size)
+            return out[:, 0], out[:, 1:4], out[:, 4] > 0
+            
+        brightness, valid = self.sample_led_regions(gray, xs, ys, region_size)
+        rgb, _ = self.sample_led_regions(image, xs, ys, region_size)
+        return brightness, rgb, valid
+        
+    def sample_led_regions(self, image, xs, ys, region_size):
+        """Average the pixel values in a square window around each LED
+        
+        xs/ys are LED centres in original image coordinates and image is either
+        a single plane or an (H, W, C) color image. Windows are clipped at the
+        image border, exactly like slicing each region by hand. Returns an (N,)
+        or (N, C) array of means and a mask of LEDs whose window overlaps the
+        image.
+        """
+        h, w = image.shape[:2]
+        
+        # Window bounds, clipped like image[y1:y2, x1:x2]
+        x1 = np.clip(xs - region_size, 0, w)
+        y1 = np.clip(ys - region_size, 0, h)
+        x2 = np.clip(xs + region_size + 1, 0, w)
+        y2 = np.clip(ys + region_size + 1, 0, h)
+        valid = (x2 > x1) & (y2 > y1)
+        
+        # Summed-area table: every window sum is four lookups regardless of size.
+        # Window sums always fit in int32, so any wrap-around in the table cancels out.
+        table_shape = (h + 1, w + 1) + image.shape[2:]
+        table = cv2.integral(image, sum=self.scratch_buffer(f'integral_{image.ndim}d', table_shape, np.int32),
+                             sdepth=cv2.CV_32S)
+        sums = table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+        
+        counts = np.where(valid, (x2 - x1) * (y2 - y1), 1)
+        means = sums / counts.reshape(counts.shape + (1,) * (image.ndim - 2))
+        
+        return means, valid
+        
     def export_csv(self):
         """Export results to CSV file"""
         if not hasattr(self, 'measurement_results') or not self.measurement_results:
@@ -683,24 +1059,31 @@ class PixelQApp:
         
         if file_path:
             try:
-                with open(file_path, 'w', newline='') as csvfile:
-                    fieldnames = ['led_id', 'row', 'col', 'brightness', 'r', 'g', 'b', 'interpolated', 'detection_method', 'measurement_method']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                fieldnames = ['led_id', 'row', 'col', 'brightness', 'r', 'g', 'b', 'interpolated', 'detection_method', 'measurement_method']
+                detection = self.detection_method.get()
+                method = self.measurement_method.get()
+                
+                # Build all rows in fieldname order up front
+                rows = [(
+                    r['id'] if 'id' in r else r.get('row', 0) * 10 + r.get('col', 0) + 1,
+                    r['row'], r['col'], r['brightness'], r['r'], r['g'], r['b'],
+                    r.get('interpolated', False), detection, method
+                ) for r in self.measurement_results]
+                
+                # Format into memory and hand the file large blocks; very large
+                # exports are flushed every 50 MB to bound peak memory
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(fieldnames)
+                with open(file_path, 'w', newline='', buffering=1 << 20) as csvfile:
+                    for start in range(0, len(rows), 10000):
+                        writer.writerows(rows[start:start + 10000])
+                        if buffer.tell() > 50 << 20:
+                            csvfile.write(buffer.getvalue())
+                            buffer.seek(0)
+                            buffer.truncate()
+                    csvfile.write(buffer.getvalue())
                     
-                    writer.writeheader()
-                    for result in self.measurement_results:
-                        result_copy = result.copy()
-                        result_copy['detection_method'] = self.detection_method.get()
-                        result_copy['measurement_method'] = self.measurement_method.get()
-                        if 'interpolated' not in result_copy:
-                            result_copy['interpolated'] = False
-                        if 'id' in result_copy:
-                            result_copy['led_id'] = result_copy['id']
-                            del result_copy['id']
-                        else:
-                            result_copy['led_id'] = result_copy.get('row', 0) * 10 + result_copy.get('col', 0) + 1
-                        writer.writerow(result_copy)
-                        
                 messagebox.showinfo("Success", f"Results exported to {file_path}")
                 
             except Exception as e:
@@ -719,15 +1102,16 @@ class PixelQApp:
         
         if file_path:
             try:
+                arr = self.led_positions_arr
                 data = {
                     'array_size': self.array_size.get(),
                     'grid_corners': self.grid_corners,
-                    'led_positions': [(x, y, int(row), int(col)) for x, y, row, col in self.led_positions],
+                    'led_positions': np.stack([arr['x'], arr['y'], arr['row'], arr['col']], axis=1).astype(np.int32),
                     'measurement_results': self.measurement_results
                 }
                 
-                with open(file_path, 'w') as f:
-                    json.dump(data, f, indent=2)
+                with open(file_path, 'wb') as f:
+                    f.write(_dumps(data, indent=True))
                     
                 messagebox.showinfo("Success", f"Results saved to {file_path}")
                 
@@ -766,31 +1150,52 @@ class PixelQApp:
         # Store position
         self.manual_positions[(row, col)] = (x, y)
         
-        # Draw marker
-        self.canvas.create_oval(x-4, y-4, x+4, y+4, fill='orange', outline='red', 
-                              width=2, tags='manual_led')
-        self.canvas.create_text(x+10, y-10, text=f'{row},{col}', fill='red', 
-                              font=('Arial', 9), tags='manual_led')
+        # Queue the marker; markers are drawn in batches by _flush_manual_markers
+        self._pending_manual.append((x, y, row, col))
+        if self._manual_flush_id is None:
+            self._manual_flush_id = self.root.after(self.manual_flush_ms, self._flush_manual_markers)
         
         self.status_var.set(f"Manual positioning: {current_count + 1}/{n*n} LEDs positioned")
         
+    def _flush_manual_markers(self):
+        """Draw all queued manual positioning markers in one go"""
+        self._manual_flush_id = None
+        for x, y, row, col in self._pending_manual:
+            self.canvas.create_oval(x-4, y-4, x+4, y+4, fill='orange', outline='red', 
+                                  width=2, tags='manual_led')
+            self.canvas.create_text(x+10, y-10, text=f'{row},{col}', fill='red', 
+                                  font=('Arial', 9), tags='manual_led')
+        self._pending_manual.clear()
+        
+    def _discard_manual_markers(self):
+        """Drop queued manual markers and remove the drawn ones"""
+        if self._manual_flush_id is not None:
+            self.root.after_cancel(self._manual_flush_id)
+            self._manual_flush_id = None
+        self._pending_manual.clear()
+        self.canvas.delete('manual_led')
+        
     def finish_manual_positioning(self, event):
         """Finish manual positioning mode"""
         self.manual_positioning = False
+        if self._manual_flush_id is not None:
+            # Show the last clicks right away
+            self.root.after_cancel(self._manual_flush_id)
+            self._flush_manual_markers()
         n = self.array_size.get()
         
         if len(self.manual_positions) == n * n:
-            # Convert manual positions to led_positions format
-            self.led_positions = []
+            # Convert manual positions to LED position columns
+            positions = []
             for row in range(n):
                 for col in range(n):
                     if (row, col) in self.manual_positions:
                         x, y = self.manual_positions[(row, col)]
-                        self.led_positions.append((x, y, row, col))
+                        positions.append((x, y, row, col))
+            self._set_leds(led_columns(positions))
             
-            self.status_var.set(f"Manual positioning complete: {len(self.led_positions)} LEDs positioned")
+            self.status_var.set(f"Manual positioning complete: {self.led_count} LEDs positioned")
             if self.grid_visible.get():
-                self.canvas.delete('led_grid')
                 self.draw_led_grid()
         else:
             self.status_var.set(f"Manual positioning incomplete: {len(self.manual_positions)}/{n*n} LEDs")
@@ -804,7 +1209,7 @@ class PixelQApp:
         """Cancel manual positioning mode"""
         self.manual_positioning = False
         self.manual_positions.clear()
-        self.canvas.delete('manual_led')
+        self._discard_manual_markers()
         self.status_var.set("Manual positioning cancelled")
         
         # Unbind events
@@ -814,7 +1219,7 @@ class PixelQApp:
         
     def start_pixel_adjustment(self):
         """Start pixel adjustment mode to fine-tune LED positions"""
-        if not self.led_positions:
+        if not self.led_count:
             messagebox.showwarning("Warning", "Please define grid corners first")
             return
             
@@ -837,52 +1242,90 @@ class PixelQApp:
             if led_index is not None:
                 self.selected_led_index = led_index
                 self.draw_led_grid_highlighted()
-                old_x, old_y, row, col = self.led_positions[led_index]
+                row = int(self.led_positions_arr['row'][led_index])
+                col = int(self.led_positions_arr['col'][led_index])
                 self.status_var.set(f"Selected LED ({row},{col}). Click new position to move it.")
         else:
             # Second click - move the selected LED to new position
-            old_x, old_y, row, col = self.led_positions[self.selected_led_index]
-            self.led_positions[self.selected_led_index] = (x, y, row, col)
+            arr = self.led_positions_arr
+            row = int(arr['row'][self.selected_led_index])
+            col = int(arr['col'][self.selected_led_index])
+            self._move_led(self.selected_led_index, x, y)
             self.selected_led_index = None
             self.draw_led_grid_highlighted()
             self.status_var.set(f"Moved LED ({row},{col}) to new position")
             
     def find_nearest_led(self, x, y, threshold=15):
         """Find the nearest LED position within threshold distance"""
-        if not self.led_positions:
+        if not self.led_count:
             return None
             
-        min_distance = float('inf')
-        nearest_index = None
-        
-        for i, (led_x, led_y, row, col) in enumerate(self.led_positions):
-            distance = np.sqrt((x - led_x)**2 + (y - led_y)**2)
-            if distance < threshold and distance < min_distance:
-                min_distance = distance
-                nearest_index = i
-                
-        return nearest_index
+        if self._led_xy is None:
+            arr = self.led_positions_arr
+            self._led_xy = np.stack([arr['x'], arr['y']], axis=1).astype(np.float32)
+            
+        # Compare squared distances, no sqrt needed
+        d2 = (self._led_xy[:, 0] - x)**2 + (self._led_xy[:, 1] - y)**2
+        i = int(d2.argmin())
+        return i if d2[i] < threshold**2 else None
         
     def draw_led_grid_highlighted(self):
         """Draw LED grid with highlighting for adjustment mode"""
-        self.canvas.delete('led_grid')
-        if not self.led_positions:
+        self.clear_led_grid()
+        if not self.led_count:
             return
             
-        for i, (x, y, row, col) in enumerate(self.led_positions):
-            if i == self.selected_led_index:
-                # Highlight selected LED
-                self.canvas.create_oval(x-5, y-5, x+5, y+5, fill='red', outline='darkred', 
-                                      width=3, tags='led_grid')
-                self.canvas.create_text(x+10, y-10, text=f'{row},{col}', fill='red', 
-                                      font=('Arial', 10, 'bold'), tags='led_grid')
-            else:
-                # Normal LED markers but more prominent for selection
-                self.canvas.create_oval(x-4, y-4, x+4, y+4, fill='yellow', outline='orange', 
-                                      width=2, tags='led_grid')
-                self.canvas.create_text(x+8, y-8, text=f'{row},{col}', fill='orange', 
-                                      font=('Arial', 8), tags='led_grid')
+        # Normal LED markers, rendered once into a single image item
+        if self._highlight_overlay is None:
+            self._highlight_overlay = self.render_highlight_overlay()
+        photo, left, top = self._highlight_overlay
+        self.canvas.create_image(left, top, anchor='nw', image=photo, tags='led_grid')
+        
+        if self.selected_led_index is not None:
+            # Highlight selected LED on top of the overlay
+            arr = self.led_positions_arr
+            i = self.selected_led_index
+            x, y, row, col = int(arr['x'][i]), int(arr['y'][i]), int(arr['row'][i]), int(arr['col'][i])
+            self.canvas.create_oval(x-5, y-5, x+5, y+5, fill='red', outline='darkred', 
+                                  width=3, tags='led_grid')
+            self.canvas.create_text(x+10, y-10, text=f'{row},{col}', fill='red', 
+                                  font=('Arial', 10, 'bold'), tags='led_grid')
                 
+    def render_highlight_overlay(self):
+        """Draw all adjustment-mode LED markers into one transparent PhotoImage"""
+        arr = self.led_positions_arr
+        if self._led_bbox is None:
+            xs, ys = arr['x'], arr['y']
+            self._led_bbox = np.stack([xs - 4, ys - 4, xs + 4, ys + 4], axis=1).astype(np.int32)
+        bbox = self._led_bbox
+        
+        # Labels are centred at (x+8, y-8) using each text's own extent; the
+        # anchor= argument is not used, since the bitmap default font of older
+        # Pillow releases ignores it
+        font = ImageFont.load_default()
+        labels = [f'{row},{col}' for row, col in zip(arr['row'].tolist(), arr['col'].tolist())]
+        extents = np.array([font.getbbox(label) for label in labels], dtype=np.int32).reshape(-1, 4)
+        text_x = bbox[:, 2] + 4 - (extents[:, 0] + extents[:, 2]) // 2
+        text_y = bbox[:, 1] - 4 - (extents[:, 1] + extents[:, 3]) // 2
+        
+        # Cover every marker and label, with the image origin at (left, top) on the canvas
+        left = int(min(bbox[:, 0].min(), (text_x + extents[:, 0]).min())) - 1
+        top = int(min(bbox[:, 1].min(), (text_y + extents[:, 1]).min())) - 1
+        right = int(max(bbox[:, 2].max(), (text_x + extents[:, 2]).max())) + 2
+        bottom = int(max(bbox[:, 3].max(), (text_y + extents[:, 3]).max())) + 2
+        overlay = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        
+        # Markers more prominent than the normal grid, for easier selection
+        origin = np.array([left, top, left, top], dtype=np.int32)
+        boxes = (bbox - origin).tolist()
+        text_origins = zip((text_x - left).tolist(), (text_y - top).tolist())
+        for box, label, text_origin in zip(boxes, labels, text_origins):
+            draw.ellipse(box, fill='yellow', outline='orange', width=2)
+            draw.text(text_origin, label, fill='orange', font=font)
+            
+        return ImageTk.PhotoImage(overlay), left, top
+        
     def exit_pixel_adjustment(self, event=None):
         """Exit pixel adjustment mode"""
         self.adjusting_pixels = False
@@ -894,17 +1337,34 @@ class PixelQApp:
         if self.grid_visible.get():
             self.draw_led_grid()
 
+    def led_region(self, xs, ys, region_size):
+        """Bounding box (x0, y0, x1, y1) of all LEDs in image coordinates, padded by one
+        LED spacing and at least region_size so it holds every sampling window
+        
+        Returns None when there are no LEDs or the box misses the image.
+        """
+        if not len(xs):
+            return None
+        n = self.array_size.get()
+        spacing = max(xs.max() - xs.min(), ys.max() - ys.min()) // max(n - 1, 1)
+        pad = int(max(spacing, region_size))
+        
+        h, w = self.original_image.shape[:2]
+        x0, y0 = max(int(xs.min()) - pad, 0), max(int(ys.min()) - pad, 0)
+        x1, y1 = min(int(xs.max()) + pad + 1, w), min(int(ys.max()) + pad + 1, h)
+        return (x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
+        
     def enhance_dark_regions(self, image):
-        """Enhance dark regions in the image for better LED detection"""
-        # Convert to float for processing
-        enhanced = image.astype(np.float32)
+        """Enhance dark regions in the image for better LED detection
         
+        The input image is left untouched; the result is a newly allocated array.
+        """
         # Apply gamma correction to brighten dark areas
         gamma = 0.5  # Values < 1 brighten the image
-        enhanced = 255.0 * np.power(enhanced / 255.0, gamma)
+        enhanced = cv2.LUT(image, self.gamma_lut(gamma))
         
         # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        lab = cv2.cvtColor(enhanced.astype(np.uint8), cv2.COLOR_RGB2LAB)
+        lab = cv2.cvtColor(enhanced, cv2.COLOR_RGB2LAB)
         l, a, b = cv2.split(lab)
         
         clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
@@ -915,56 +1375,56 @@ class PixelQApp:
         
         return enhanced
         
-
+    def gamma_lut(self, gamma):
+        """Return the cached uint8 lookup table for a gamma curve"""
+        lut = self._gamma_luts.get(gamma)
+        if lut is None:
+            # Truncating cast, same rounding as the per-pixel float version
+            lut = (255.0 * (np.arange(256) / 255.0) ** gamma).astype(np.uint8)
+            self._gamma_luts[gamma] = lut
+        return lut
         
     def interpolate_grid_measurements(self, measurements):
         """Interpolate measurements for missing or dark LEDs"""
         n = self.array_size.get()
         interpolated = measurements.copy()
         
-        for row in range(n):
-            for col in range(n):
-                key = (row, col)
-                if key not in measurements or measurements[key]['brightness'] < 10:  # Dark threshold
-                    # Find nearby measurements for interpolation
-                    nearby_values = []
-                    
-                    # Check 8 surrounding positions
-                    for dr in [-1, 0, 1]:
-                        for dc in [-1, 0, 1]:
-                            if dr == 0 and dc == 0:
-                                continue
-                            nr, nc = row + dr, col + dc
-                            nearby_key = (nr, nc)
-                            if (0 <= nr < n and 0 <= nc < n and 
-                                nearby_key in measurements and 
-                                measurements[nearby_key]['brightness'] >= 10):
-                                nearby_values.append(measurements[nearby_key])
-                    
-                    if nearby_values:
-                        # Interpolate values
-                        avg_brightness = np.mean([v['brightness'] for v in nearby_values])
-                        avg_r = np.mean([v['r'] for v in nearby_values])
-                        avg_g = np.mean([v['g'] for v in nearby_values])
-                        avg_b = np.mean([v['b'] for v in nearby_values])
-                        
-                        interpolated[key] = {
-                            'brightness': avg_brightness * 0.1,  # Assume dark LED is 10% of neighbors
-                            'r': avg_r * 0.1,
-                            'g': avg_g * 0.1,
-                            'b': avg_b * 0.1,
-                            'interpolated': True
-                        }
-                    else:
-                        # No nearby measurements, use minimum values
-                        interpolated[key] = {
-                            'brightness': 1.0,
-                            'r': 1.0,
-                            'g': 1.0,
-                            'b': 1.0,
-                            'interpolated': True
-                        }
-                        
+        # Pack measurements into (brightness, r, g, b) planes over the n x n grid
+        values = np.zeros((4, n, n))
+        measured = np.zeros((n, n), dtype=bool)
+        for (row, col), data in measurements.items():
+            if 0 <= row < n and 0 <= col < n:
+                values[:, row, col] = (data['brightness'], data['r'], data['g'], data['b'])
+                measured[row, col] = True
+                
+        # Only bright LEDs are used as neighbours; all other cells get filled
+        usable = measured & (values[0] >= 10)  # Dark threshold
+        
+        # Sum usable values over the 8 surrounding positions of every cell
+        if _neighbour_sums is not None:
+            neighbour_sum, neighbour_count = _neighbour_sums(values, usable)
+        else:
+            # An unnormalized 3x3 box sum (zero outside the grid) minus the cell itself
+            mask = usable.astype(np.float64)
+            planes = np.ascontiguousarray((values * mask).transpose(1, 2, 0))
+            box = dict(ddepth=-1, ksize=(3, 3), normalize=False, borderType=cv2.BORDER_CONSTANT)
+            neighbour_sum = (cv2.boxFilter(planes, **box).reshape(n, n, 4) - planes).transpose(2, 0, 1)
+            neighbour_count = cv2.boxFilter(mask, **box) - mask
+            
+        # Assume dark LED is 10% of neighbours; without neighbours use minimum values
+        has_neighbours = neighbour_count > 0
+        filled = np.where(has_neighbours, neighbour_sum / np.maximum(neighbour_count, 1) * 0.1, 1.0)
+        
+        for row, col in zip(*np.nonzero(~usable)):
+            brightness, r, g, b = filled[:, row, col].tolist()
+            interpolated[(int(row), int(col))] = {
+                'brightness': brightness,
+                'r': r,
+                'g': g,
+                'b': b,
+                'interpolated': True
+            }
+            
         return interpolated
 
 
@@ -979,9 +1439,11 @@ class PixelQApp:
                                   
     def clear_all_detections(self):
         """Clear all detection results"""
-        self.save_state()  # Save state before clearing
+        # Record immutable snapshots; the LED columns are shared rather than copied
+        self.save_state('clear', (tuple(self.grid_corners), self.freeze_led_columns(),
+                                  tuple(self.manual_positions.items()), self.array_size.get()))
         self.grid_corners = []
-        self.led_positions = []
+        self._set_leds(led_columns())
         self.manual_positions = {}
         
         # Exit corner editing mode if active
@@ -990,8 +1452,8 @@ class PixelQApp:
         
         # Clear canvas overlays
         self.canvas.delete('corners')
-        self.canvas.delete('led_grid')
-        self.canvas.delete('manual_led')
+        self.clear_led_grid()
+        self._discard_manual_markers()
         
         self.status_var.set("All detections cleared")
         
@@ -1014,16 +1476,15 @@ class PixelQApp:
         if not self.grid_corners:
             return None
             
-        min_distance = float('inf')
-        nearest_index = None
-        
-        for i, (cx, cy) in enumerate(self.grid_corners):
-            distance = np.sqrt((x - cx)**2 + (y - cy)**2)
-            if distance < threshold and distance < min_distance:
-                min_distance = distance
-                nearest_index = i
-                
-        return nearest_index
+        # Corners are edited in place in several places, so key the cache on their values
+        key = tuple(self.grid_corners)
+        if self._corner_xy is None or self._corner_xy[0] != key:
+            self._corner_xy = (key, np.array(key, dtype=np.float32))
+        corners = self._corner_xy[1]
+        
+        d2 = (corners[:, 0] - x)**2 + (corners[:, 1] - y)**2
+        i = int(d2.argmin())
+        return i if d2[i] < threshold**2 else None
         
     def exit_corner_editing(self, event=None):
         """Exit corner editing mode"""
@@ -1034,51 +1495,81 @@ class PixelQApp:
             self.root.unbind('<Escape>')
             
     # Undo/Redo System
-    def save_state(self):
-        """Save current state for undo functionality"""
-        state = {
-            'grid_corners': self.grid_corners.copy(),
-            'led_positions': self.led_positions.copy(),
-            'manual_positions': self.manual_positions.copy(),
-            'array_size': self.array_size.get()
-        }
-        
-        # Add to history
-        self.history.append(state)
-        
-        # Limit history size
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-            
+    def save_state(self, kind, payload):
+        """Record an undoable change"""
+        # Add to history; the deque drops the oldest change past max_history
+        self.history.append(Change(kind, payload))
+        
         # Clear redo stack when new action is performed
         self.redo_stack.clear()
         
+    def copy_led_columns(self, columns=None):
+        """Return an independent copy of the LED position columns"""
+        columns = self.led_positions_arr if columns is None else columns
+        return {key: values.copy() for key, values in columns.items()}
+        
+    def freeze_led_columns(self, columns=None):
+        """Mark the LED position columns read-only so undo history can share them"""
+        columns = self.led_positions_arr if columns is None else columns
+        for values in columns.values():
+            values.flags.writeable = False
+        return columns
+        
+    def apply_change(self, change, reverse=False):
+        """Replay a recorded change, or roll it back when reverse is set"""
+        # LED columns are restored rather than recomputed, since they may have
+        # been adjusted off the grid; they are read-only and copied on write
+        if change.kind == 'corner_move':
+            index, old_corner, new_corner, old_leds, new_leds, n = change.payload
+            self.grid_corners[index] = old_corner if reverse else new_corner
+            self._set_leds(old_leds if reverse else new_leds)
+            self.array_size.set(n)
+            
+        elif change.kind == 'define_corners':
+            old_corners, new_corners, old_leds, new_leds, old_n, new_n = change.payload
+            self.grid_corners = list(old_corners if reverse else new_corners)
+            self._set_leds(old_leds if reverse else new_leds)
+            self.array_size.set(old_n if reverse else new_n)
+                
+        elif change.kind == 'clear':
+            corners, leds, manual, n = change.payload
+            if reverse:
+                self.grid_corners = list(corners)
+                self._set_leds(leds)
+                self.manual_positions = dict(manual)
+                self.array_size.set(n)
+            else:
+                self.grid_corners = []
+                self._set_leds(led_columns())
+                self.manual_positions = {}
+                
+        self.grid_corner_count = len(self.grid_corners)
+        
+    def cancel_grid_definition(self):
+        """Abandon an unfinished corner definition and restore the previous corners"""
+        # LED positions are only recalculated once all 4 corners are placed,
+        # so they still match the previous corners
+        corners, _, _ = self._corners_before_definition
+        self.drawing_grid = False
+        self.grid_corners = list(corners)
+        self.grid_corner_count = len(self.grid_corners)
+        
     def undo(self, event=None):
         """Undo last action"""
-        if not self.history:
+        if self.drawing_grid:
+            # Undo the start of an unfinished corner definition
+            self.cancel_grid_definition()
+        elif not self.history:
             self.status_var.set("Nothing to undo")
             return
+        else:
+            # Roll back the last change and keep it for redo
+            change = self.history.pop()
+            self.apply_change(change, reverse=True)
+            self.redo_stack.append(change)
             
-        # Save current state to redo stack
-        current_state = {
-            'grid_corners': self.grid_corners.copy(),
-            'led_positions': self.led_positions.copy(),
-            'manual_positions': self.manual_positions.copy(),
-            'array_size': self.array_size.get()
-        }
-        self.redo_stack.append(current_state)
-        
-        # Restore previous state
-        previous_state = self.history.pop()
-        self.grid_corners = previous_state['grid_corners']
-        self.led_positions = previous_state['led_positions']
-        self.manual_positions = previous_state['manual_positions']
-        self.array_size.set(previous_state['array_size'])
-        
         # Redraw everything
-        self.draw_grid_corners()
-        if self.grid_visible.get():
-            self.draw_led_grid()
+        self.refresh_overlays()
             
         self.status_var.set("Undo completed")
         
@@ -1088,26 +1579,13 @@ class PixelQApp:
             self.status_var.set("Nothing to redo")
             return
             
-        # Save current state to history
-        current_state = {
-            'grid_corners': self.grid_corners.copy(),
-            'led_positions': self.led_positions.copy(),
-            'manual_positions': self.manual_positions.copy(),
-            'array_size': self.array_size.get()
-        }
-        self.history.append(current_state)
-        
-        # Restore redo state
-        redo_state = self.redo_stack.pop()
-        self.grid_corners = redo_state['grid_corners']
-        self.led_positions = redo_state['led_positions']
-        self.manual_positions = redo_state['manual_positions']
-        self.array_size.set(redo_state['array_size'])
+        # Replay the change and move it back to history
+        change = self.redo_stack.pop()
+        self.apply_change(change)
+        self.history.append(change)
         
         # Redraw everything
-        self.draw_grid_corners()
-        if self.grid_visible.get():
-            self.draw_led_grid()
+        self.refresh_overlays()
             
         self.status_var.set("Redo completed")
         
@@ -1124,17 +1602,27 @@ class PixelQApp:
         """Zoom in on the image"""
         if self.zoom_level < self.max_zoom:
             self.zoom_level += self.zoom_step
-            self.apply_zoom()
+            self.schedule_zoom()
             
     def zoom_out(self):
         """Zoom out on the image"""
         if self.zoom_level > self.min_zoom:
             self.zoom_level -= self.zoom_step
-            self.apply_zoom()
+            self.schedule_zoom()
             
     def reset_zoom(self):
         """Reset zoom to 100%"""
         self.zoom_level = 1.0
+        self.schedule_zoom()
+        
+    def schedule_zoom(self):
+        """Redraw the zoomed image shortly, so a burst of wheel events renders once"""
+        if not self._zoom_pending:
+            self._zoom_pending = self.root.after(self.zoom_delay_ms, self._flush_zoom)
+        
+    def _flush_zoom(self):
+        """Run the scheduled zoom redraw"""
+        self._zoom_pending = None
         self.apply_zoom()
         
     def apply_zoom(self):
@@ -1145,6 +1633,12 @@ class PixelQApp:
         # Update zoom label
         self.zoom_label.config(text=f"Zoom: {int(self.zoom_level * 100)}%")
         
+        # Nothing to do if the wheel burst ended back where it started
+        zoom = (id(self.original_image), self.zoom_level)
+        if zoom == self._last_zoom:
+            return
+        self._last_zoom = zoom
+        
         # Calculate new dimensions
         original_height, original_width = self.original_image.shape[:2]
         
@@ -1152,32 +1646,73 @@ class PixelQApp:
         new_width = int(original_width * self.zoom_level)
         new_height = int(original_height * self.zoom_level)
         
-        # Resize image
-        zoomed_image = cv2.resize(self.original_image, (new_width, new_height), 
-                                 interpolation=cv2.INTER_LINEAR)
+        # Scale factor for coordinate conversion, applied once the frame is shown
+        scale_factor = min(self.canvas_width / new_width, 
+                           self.canvas_height / new_height) * self.zoom_level
+        
+        key = ('zoom', id(self.original_image), scale_factor, round(self.zoom_level, 4),
+               self.canvas_width, self.canvas_height)
+        self._zoom_gen += 1
+        if key in self._photo_cache:
+            self.install_zoom(key, scale_factor, None)
+            return
+            
+        # A queued resize that has not started yet is no longer needed
+        if self._zoom_future is not None:
+            self._zoom_future.cancel()
+            
+        # Resize image off the Tk thread; area averaging is both sharper and faster when shrinking
+        shrinking = new_width < original_width
+        job = (self._zoom_gen, key, scale_factor)
+        self._zoom_future = self._resize_pool.submit(
+            self.resize_for_zoom, self._zoom_gen, self.original_image, (new_width, new_height),
+            cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+        self._zoom_future.add_done_callback(lambda f: self.zoom_done(job, f))
+        
+        self._zoom_jobs += 1
+        if self._zoom_jobs == 1:
+            self.root.after(self.zoom_poll_ms, self.poll_zoom_results)
+            
+    def resize_for_zoom(self, gen, image, size, interpolation):
+        """Worker-thread resize, skipped if a newer zoom was requested while it waited"""
+        if gen != self._zoom_gen:
+            return None
+        return cv2.resize(image, size, interpolation=interpolation)
         
-        # Update scale factor for coordinate conversion
-        self.scale_factor = min(self.canvas_width / new_width, 
-                               self.canvas_height / new_height) * self.zoom_level
+    def zoom_done(self, job, future):
+        """Worker-thread callback: queue the finished job, without the frame if it is stale"""
+        # Superseded frames can be hundreds of MB, so they are not kept waiting for the poll
+        self._zoom_results.put((job, future if job[0] == self._zoom_gen else None))
         
-        # Convert to display format
-        if len(zoomed_image.shape) == 3:
-            display_image = Image.fromarray(zoomed_image)
-        else:
-            display_image = Image.fromarray(cv2.cvtColor(zoomed_image, cv2.COLOR_BGR2RGB))
+    def poll_zoom_results(self):
+        """Install finished zoom frames on the Tk thread, dropping superseded ones"""
+        try:
+            while True:
+                (gen, key, scale_factor), future = self._zoom_results.get_nowait()
+                self._zoom_jobs -= 1
+                if future is not None and gen == self._zoom_gen and not future.cancelled():
+                    zoomed_image = future.result()
+                    if future is self._zoom_future:
+                        self._zoom_future = None  # Don't pin the frame once it is handed to Tk
+                    if zoomed_image is not None:
+                        self.install_zoom(key, scale_factor, zoomed_image)
+        except queue.Empty:
+            pass
+        finally:
+            # Keep polling while resizes are still running
+            if self._zoom_jobs:
+                self.root.after(self.zoom_poll_ms, self.poll_zoom_results)
             
-        # Create PhotoImage
-        self.photo = ImageTk.PhotoImage(display_image)
+    def install_zoom(self, key, scale_factor, zoomed_image):
+        """Show a zoomed frame, building its PhotoImage unless it is already cached"""
+        self.scale_factor = scale_factor
+        self.photo = self.get_cached_photo(key, lambda: self.array_to_photo(zoomed_image))
         
         # Update canvas
-        self.canvas.delete("all")
-        self.canvas.create_image(self.canvas_width//2, self.canvas_height//2, 
-                               image=self.photo, anchor=tk.CENTER)
+        self.show_bitmap()
         
         # Redraw overlays with updated coordinates
-        self.draw_grid_corners()
-        if self.grid_visible.get():
-            self.draw_led_grid()
+        self.refresh_overlays()
 
 def main():
     """Main function to run the PixelQ application"""